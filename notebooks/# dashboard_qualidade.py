@@ -8,7 +8,7 @@ Funcionalidades:
 - Constrói Data Docs (HTML gerado pelo GE)
 - Calcula métricas agregadas de qualidade por dataset
 - Gera um relatório HTML executivo customizado (TechCommerce)
-- Tenta exportar o relatório para PDF (weasyprint ou pdfkit)
+- Tenta exportar o relatório para PDF (playwright, weasyprint ou pdfkit)
 - Log detalhado das operações em data/dashboard_qualidade.log
 """
 
@@ -18,11 +18,19 @@ import shutil
 import logging
 from pathlib import Path
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 # Tentativas opcionais de dependências para export PDF
+try:
+    from playwright.sync_api import sync_playwright
+    _HAS_PLAYWRIGHT = True
+except Exception:
+    _HAS_PLAYWRIGHT = False
+
 try:
     from weasyprint import HTML
     _HAS_WEASYPRINT = True
@@ -46,9 +54,17 @@ except Exception:
 # -------------------------
 # Paths (seguindo seu contrato: originais em /datasets, processados em /data)
 ROOT_DIR = Path.cwd()
-DATA_DIR = Path("data")              # deve conter os datasets processados
+DATA_DIR = Path("data")              # deve conter os datasets processados (Parquet)
 DOCS_DIR = DATA_DIR / "quality_docs"  # saída de docs e relatórios
 GE_DIR = Path("great_expectations")   # data context do GE
+DATA_DOCS_INDEX = GE_DIR / "uncommitted" / "data_docs" / "local_site" / "index.html"
+
+# Datasets sem coluna id_*: acima disso duplicatas não são calculadas
+# (exigem hashear as linhas inteiras)
+DUPLICATAS_MAX_LINHAS = 1_000_000
+
+VALIDATION_MAX_WORKERS = 8
+VALIDATION_MAX_TENTATIVAS = 3
 
 DOCS_DIR.mkdir(parents=True, exist_ok=True)
 (Path("logs")).mkdir(exist_ok=True)
@@ -84,9 +100,9 @@ def setup_great_expectations_context():
         else:
             logging.info("Criando novo Great Expectations Data Context em %s", str(GE_DIR.resolve()))
             context = ge.data_context.DataContext.create(project_root_dir=str(GE_DIR))
-            # Cria datasources simples baseados em CSVs em /data (PandasDatasource)
+            # Cria datasources simples baseados nos arquivos de /data (PandasDatasource)
             # Não sobrescreve se já existirem datasources
-            # We'll add a single PandasDatasource for CSVs in /data
+            # We'll add a single PandasDatasource for files in /data
             try:
                 context.add_datasource(
                     name="csv_files",
@@ -107,9 +123,51 @@ def setup_great_expectations_context():
         return None
 
 # -------------------------
+def _resolve_suite_path(suite_name):
+    """
+    Heurística: usa data/<suite_name>.parquet ou, sem o sufixo "_suite",
+    data/<nome>.parquet. Retorna None se nenhum existir.
+    """
+    candidate_path = DATA_DIR / f"{suite_name}.parquet"
+    if candidate_path.exists():
+        return candidate_path
+    # tenta sem sufixo "_suite" e sem "suite"
+    if candidate_path.name.endswith("_suite.parquet"):
+        alt = DATA_DIR / candidate_path.name.replace("_suite.parquet", ".parquet")
+        if alt.exists():
+            return alt
+    return None
+
+def _validate_one(context, suite_name, candidate_path):
+    """
+    Valida uma suite (com até VALIDATION_MAX_TENTATIVAS tentativas) e grava o
+    JSON do resultado em docs assim que termina.
+    A suite é lida uma vez, antes das tentativas; o validator, que carrega o
+    batch, é criado a cada tentativa para sempre ler o arquivo atual.
+    """
+    batch_kwargs = {"path": str(candidate_path.resolve()), "datasource": "csv_files"}
+    suite = context.get_expectation_suite(expectation_suite_name=suite_name)
+    for tentativa in range(1, VALIDATION_MAX_TENTATIVAS + 1):
+        try:
+            # get_validator pode ser lançado se não houver datasource/esquema; tentar de forma segura
+            validator = context.get_validator(batch_kwargs=batch_kwargs, expectation_suite=suite)
+            validation_result = validator.validate()
+            break
+        except Exception as e:
+            logging.warning("Tentativa %d/%d falhou para suite %s: %s", tentativa, VALIDATION_MAX_TENTATIVAS, suite_name, e)
+            if tentativa == VALIDATION_MAX_TENTATIVAS:
+                raise
+    # Salva resultado JSON em docs
+    out_json = DOCS_DIR / f"validation_result_{suite_name}.json"
+    with open(out_json, "w", encoding="utf-8") as f:
+        json.dump(validation_result.to_json_dict(), f, ensure_ascii=False, indent=2)
+    logging.info("Validação concluída para %s. Resultado salvo em %s", suite_name, str(out_json))
+    return validation_result
+
 def run_validations_for_all_suites(context):
     """
-    Para cada expectation suite no contexto, tenta validar o correspondente arquivo CSV em /data.
+    Para cada expectation suite no contexto, tenta validar o correspondente arquivo Parquet em /data.
+    As suites são validadas em paralelo e cada resultado é gravado ao terminar.
     Retorna um dicionário com resultados por suite.
     """
     results = {}
@@ -123,41 +181,39 @@ def run_validations_for_all_suites(context):
         logging.warning("Não foi possível listar expectation suites: %s", e)
         return results
 
-    # batch selection: iremos procurar arquivos CSV com nomes correspondentes aos suites (heurística)
+    # batch selection: iremos procurar arquivos Parquet com nomes correspondentes aos suites (heurística)
+    pendentes = {}
     for suite in suites:
         suite_name = suite.expectation_suite_name
         logging.info("Processando expectation suite: %s", suite_name)
-        # heurística: se existe data/<suite_name>.csv usar como batch
-        candidate_path = DATA_DIR / f"{suite_name}.csv"
-        if not candidate_path.exists():
-            # tenta sem sufixo "_suite" e sem "suite"
-            alt = candidate_path
-            if candidate_path.name.endswith("_suite.csv"):
-                alt = DATA_DIR / candidate_path.name.replace("_suite.csv", ".csv")
-            if not alt.exists():
-                logging.info("Arquivo para suite %s não encontrado em %s. Pulando.", suite_name, str(DATA_DIR.resolve()))
-                continue
-            candidate_path = alt
+        candidate_path = _resolve_suite_path(suite_name)
+        if candidate_path is None:
+            logging.info("Arquivo para suite %s não encontrado em %s. Pulando.", suite_name, str(DATA_DIR.resolve()))
+            continue
+        pendentes[suite_name] = candidate_path
 
-        try:
-            batch_kwargs = {"path": str(candidate_path.resolve()), "datasource": "csv_files"}
-            # get_validator pode ser lançado se não houver datasource/esquema; tentar de forma segura
-            validator = context.get_validator(batch_kwargs=batch_kwargs, expectation_suite_name=suite_name, create_expectation_suite=False)
-            validation_result = validator.validate()
-            results[suite_name] = validation_result
-            # Salva resultado JSON em docs
-            out_json = DOCS_DIR / f"validation_result_{suite_name}.json"
-            with open(out_json, "w", encoding="utf-8") as f:
-                json.dump(validation_result.to_json_dict(), f, ensure_ascii=False, indent=2)
-            logging.info("Validação concluída para %s. Resultado salvo em %s", suite_name, str(out_json))
-        except Exception as e:
-            logging.error("Erro ao validar suite %s: %s", suite_name, e)
+    if not pendentes:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(VALIDATION_MAX_WORKERS, len(pendentes))) as ex:
+        futs = {
+            ex.submit(_validate_one, context, suite_name, path): suite_name
+            for suite_name, path in pendentes.items()
+        }
+        for fut in as_completed(futs):
+            suite_name = futs[fut]
+            try:
+                results[suite_name] = fut.result()
+            except Exception as e:
+                logging.error("Erro ao validar suite %s: %s", suite_name, e)
     return results
 
 # -------------------------
 def build_great_expectations_datadocs(context):
     """
     Constrói Data Docs (HTML) via Great Expectations.
+    Pula o rebuild se o index.html existente for mais novo que todas as
+    suites e resultados de validação (*.json) do contexto.
     Devolve o caminho onde os docs foram construídos ou None.
     """
     if context is None:
@@ -165,6 +221,12 @@ def build_great_expectations_datadocs(context):
         return None
 
     try:
+        max_src = max((p.stat().st_mtime for p in GE_DIR.rglob("*.json")), default=0)
+        if DATA_DOCS_INDEX.exists() and DATA_DOCS_INDEX.stat().st_mtime >= max_src:
+            docs_sites = context.get_docs_sites_urls()
+            logging.info("Data Docs já atualizados; rebuild pulado. Sites: %s", docs_sites)
+            return docs_sites
+
         context.build_data_docs()  # gera os HTMLs no diretório definido no context
         docs_sites = context.get_docs_sites_urls()
         logging.info("Data Docs gerados. Sites: %s", docs_sites)
@@ -174,48 +236,77 @@ def build_great_expectations_datadocs(context):
         return None
 
 # -------------------------
+def _parquet_null_counts(pf):
+    """
+    Soma os null_count das estatísticas de cada row group, sem ler os dados.
+    Colunas sem estatística são lidas individualmente.
+    """
+    meta = pf.metadata
+    nulls = {}
+    for i, col in enumerate(pf.schema_arrow.names):
+        total = 0
+        for rg in range(meta.num_row_groups):
+            stats = meta.row_group(rg).column(i).statistics
+            if stats is None or not stats.has_null_count:
+                total = pf.read(columns=[col]).column(0).null_count
+                break
+            total += stats.null_count
+        nulls[col] = total
+    return nulls
+
 def compute_dataset_metrics():
     """
-    Calcula métricas de qualidade e dimensões para todos os CSVs em /data.
+    Calcula métricas de qualidade e dimensões para todos os Parquet em /data.
+    Linhas, colunas e nulos vêm dos metadados; as métricas específicas leem
+    só as colunas necessárias. Duplicatas são contadas pela primeira coluna
+    id_* (chave); sem chave, por linha inteira em datasets com até
+    DUPLICATAS_MAX_LINHAS linhas (None nos demais).
     Retorna um dict com resumos por dataset.
     """
     metrics = {}
-    csv_files = sorted([p for p in DATA_DIR.glob("*.csv")])
-    if not csv_files:
-        logging.warning("Nenhum CSV encontrado em %s", str(DATA_DIR.resolve()))
+    parquet_files = sorted([p for p in DATA_DIR.glob("*.parquet")])
+    if not parquet_files:
+        logging.warning("Nenhum Parquet encontrado em %s", str(DATA_DIR.resolve()))
         return metrics
 
-    for csv in csv_files:
-        name = csv.stem
+    for path in parquet_files:
+        name = path.stem
         try:
-            df = pd.read_csv(csv, on_bad_lines="skip")
-            total = len(df)
-            nulls = df.isnull().sum().to_dict()
-            duplicates = df.duplicated().sum()
-            cols = list(df.columns)
+            pf = pq.ParquetFile(path)
+            total = pf.metadata.num_rows
+            cols = list(pf.schema_arrow.names)
+            nulls = _parquet_null_counts(pf)
+            key = next((c for c in cols if c.startswith("id_")), None)
+            duplicates = None
+            if key:
+                distintos = pc.count_distinct(pf.read(columns=[key]).column(0), mode="all").as_py()
+                duplicates = int(total - distintos)
+            elif total <= DUPLICATAS_MAX_LINHAS:
+                duplicates = int(pf.read().to_pandas().duplicated().sum())
             # exemplos de métricas específicas
             metric = {
-                "arquivo": str(csv),
+                "arquivo": str(path),
                 "linhas": int(total),
                 "colunas": len(cols),
                 "colunas_lista": cols,
                 "nulls_por_coluna": {k: int(v) for k, v in nulls.items()},
-                "duplicatas": int(duplicates),
+                "duplicatas": duplicates,
             }
             # métricas adicionais heurísticas
-            if "id_cliente" in df.columns:
-                metric["clientes_unicos"] = int(df["id_cliente"].nunique())
-            if "preco" in df.columns:
+            if "id_cliente" in cols:
+                metric["clientes_unicos"] = int(pc.count_distinct(pf.read(columns=["id_cliente"]).column(0)).as_py())
+            if "preco" in cols:
                 try:
-                    metric["preco_min"] = float(df["preco"].min())
-                    metric["preco_max"] = float(df["preco"].max())
+                    preco = pc.min_max(pf.read(columns=["preco"]).column(0)).as_py()
+                    metric["preco_min"] = float(preco["min"])
+                    metric["preco_max"] = float(preco["max"])
                 except Exception:
                     pass
 
             metrics[name] = metric
-            logging.info("Métricas calculadas para %s: linhas=%d, duplicatas=%d", name, total, duplicates)
+            logging.info("Métricas calculadas para %s: linhas=%d, duplicatas=%s", name, total, duplicates)
         except Exception as e:
-            logging.error("Erro ao calcular métricas para %s: %s", str(csv), e)
+            logging.error("Erro ao calcular métricas para %s: %s", str(path), e)
     return metrics
 
 # -------------------------
@@ -230,64 +321,77 @@ def render_executive_html(metrics, ge_docs_urls=None, output_path=DOCS_DIR / "ex
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     title = "TechCommerce - Relatório Executivo de Qualidade de Dados"
     header = f"""
-    <div style="font-family: Arial, sans-serif; margin: 20px;">
-      <h1 style="color:#1f4e79;">{title}</h1>
+    <div class="header">
+      <h1>{title}</h1>
       <p>Gerado em: {now}</p>
       <hr/>
     </div>
     """
+    # Um único <style> no <head> em vez de estilos inline repetidos; tabelas com
+    # layout fixo para o weasyprint não medir todas as células de cada coluna
+    style = """
+        <style>
+          body { font-family: Arial, sans-serif; }
+          h1 { color: #1f4e79; }
+          .header, .content { margin: 20px; }
+          table { table-layout: fixed; width: 100%; border-collapse: collapse; }
+          th, td { overflow: hidden; word-break: normal; text-align: left; padding: 2px 6px; border-bottom: 1px solid #ddd; }
+        </style>
+    """
+
+    # Monta o HTML em uma lista de partes e junta uma única vez no final
+    parts = [f"""
+    <html>
+      <head>
+        <meta charset="utf-8"/>
+        <title>{title}</title>
+        {style}
+      </head>
+      <body>
+        {header}
+        <div class="content">
+          <h2>Sumário de Métricas</h2>
+          """]
 
     # Metrícas
-    tables_html = ""
     for name, m in metrics.items():
-        tables_html += f"<h2 style='font-family: Arial, sans-serif;'>{name}</h2>"
-        tables_html += "<ul style='font-family: Arial, sans-serif;'>"
-        tables_html += f"<li>Linhas: {m.get('linhas')}</li>"
-        tables_html += f"<li>Colunas: {m.get('colunas')}</li>"
-        tables_html += f"<li>Duplicatas: {m.get('duplicatas')}</li>"
-        # nulls
+        parts.append(
+            f"<h2>{name}</h2>"
+            "<ul>"
+            f"<li>Linhas: {m.get('linhas')}</li>"
+            f"<li>Colunas: {m.get('colunas')}</li>"
+            f"<li>Duplicatas: {m.get('duplicatas')}</li>"
+            "</ul>"
+        )
+        # nulls: uma tabela de duas colunas em vez de listas aninhadas
         nulls = m.get("nulls_por_coluna", {})
         if nulls:
-            tables_html += "<li>Nulls por coluna:<ul>"
-            for c, n in nulls.items():
-                tables_html += f"<li>{c}: {n}</li>"
-            tables_html += "</ul></li>"
-        tables_html += "</ul>"
+            parts.append("<table><thead><tr><th>Coluna</th><th>Nulls</th></tr></thead><tbody>")
+            parts.append("".join(f"<tr><td>{c}</td><td>{n}</td></tr>" for c, n in nulls.items()))
+            parts.append("</tbody></table>")
 
     # Great Expectations links (se disponível)
-    ge_section = ""
     if ge_docs_urls:
-        ge_section += "<h2>Great Expectations - Data Docs</h2>"
-        ge_section += "<ul>"
+        parts.append("<h2>Great Expectations - Data Docs</h2>")
+        parts.append("<ul>")
         # ge_docs_urls pode ser um dict ou lista; normalizar
         try:
             if isinstance(ge_docs_urls, dict):
                 for site_name, url in ge_docs_urls.items():
-                    ge_section += f"<li>{site_name}: <a href='{url}' target='_blank'>{url}</a></li>"
+                    parts.append(f"<li>{site_name}: <a href='{url}' target='_blank'>{url}</a></li>")
             elif isinstance(ge_docs_urls, list):
                 for url in ge_docs_urls:
-                    ge_section += f"<li><a href='{url}' target='_blank'>{url}</a></li>"
+                    parts.append(f"<li><a href='{url}' target='_blank'>{url}</a></li>")
         except Exception:
-            ge_section += "<li>Data Docs gerados (ver pasta great_expectations). Verifique localmente.</li>"
-        ge_section += "</ul>"
+            parts.append("<li>Data Docs gerados (ver pasta great_expectations). Verifique localmente.</li>")
+        parts.append("</ul>")
 
-    # Monta HTML final
-    html = f"""
-    <html>
-      <head>
-        <meta charset="utf-8"/>
-        <title>{title}</title>
-      </head>
-      <body>
-        {header}
-        <div style="margin: 20px;">
-          <h2 style="font-family: Arial, sans-serif;">Sumário de Métricas</h2>
-          {tables_html}
-          {ge_section}
+    parts.append("""
         </div>
       </body>
     </html>
-    """
+    """)
+    html = "".join(parts)
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html)
@@ -297,9 +401,25 @@ def render_executive_html(metrics, ge_docs_urls=None, output_path=DOCS_DIR / "ex
 # -------------------------
 def export_html_to_pdf(html_path: Path, pdf_path: Path):
     """
-    Tenta exportar HTML para PDF usando weasyprint ou pdfkit (wkhtmltopdf).
+    Tenta exportar HTML para PDF usando Chromium headless (playwright), que é
+    bem mais rápido em HTMLs grandes, e depois weasyprint ou pdfkit (wkhtmltopdf).
     Retorna True se sucesso, False caso contrário.
     """
+    if _HAS_PLAYWRIGHT:
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch()
+                try:
+                    page = browser.new_page()
+                    page.goto(html_path.resolve().as_uri())
+                    page.pdf(path=str(pdf_path))
+                finally:
+                    browser.close()
+            logging.info("Exportado PDF via playwright (chromium) em %s", str(pdf_path))
+            return True
+        except Exception as e:
+            logging.error("playwright erro: %s", e)
+
     if _HAS_WEASYPRINT:
         try:
             HTML(filename=str(html_path)).write_pdf(str(pdf_path))
@@ -316,7 +436,7 @@ def export_html_to_pdf(html_path: Path, pdf_path: Path):
         except Exception as e:
             logging.error("pdfkit erro: %s", e)
 
-    logging.warning("Nenhuma biblioteca de conversão para PDF disponível (weasyprint/pdfkit). Não foi possível gerar PDF.")
+    logging.warning("Nenhuma biblioteca de conversão para PDF disponível (playwright/weasyprint/pdfkit). Não foi possível gerar PDF.")
     return False
 
 # -------------------------
@@ -5,14 +5,19 @@ import numpy as np
 import re
 from pathlib import Path
 import logging
+from joblib import Parallel, delayed
 
 # -------------------------------------------------
 # Configuração de logs
-logging.basicConfig(
-    filename="logs/correcao_automatica.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+def configurar_logs():
+    """Configura o log do módulo (no-op se já configurado no processo)"""
+    logging.basicConfig(
+        filename="logs/correcao_automatica.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+
+configurar_logs()
 
 # -------------------------------------------------
 DATA_DIR = Path("data")
@@ -20,26 +25,46 @@ OUTPUT_DIR = Path("data_corrigida")
 OUTPUT_DIR.mkdir(exist_ok=True)
 LOG_FILE = OUTPUT_DIR / "correcao_resumo.txt"
 
+# Datasets independentes até a validação de relacionamentos:
+# (nome, chave, colunas devolvidas ao processo principal; None = todas)
+DATASETS = [
+    ("clientes", "id_cliente", ["id_cliente"]),
+    ("produtos", "id_produto", ["id_produto"]),
+    ("vendas", "id_venda", None),
+    ("logistica", "id_entrega", None),
+    ("clientes_lab", "id_cliente", []),
+]
+
+DIGITS_ONLY = re.compile(r"\D")
+
+# Valores padrão para campos nulos, por dataset
+PADROES_PREENCHIMENTO = {
+    "clientes": {"estado": "SP", "cidade": "São Paulo", "nome": "Desconhecido"},
+    "produtos": {"categoria": "Outros", "ativo": True},
+    "vendas": {"status": "Pendente"},
+    "logistica": {"status_entrega": "Em trânsito"},
+}
+
 # -------------------------------------------------
 def padronizar_dados(df, tipo):
     """Padroniza formatos de colunas genéricas"""
-    for col in df.columns:
-        # Datas
-        if "data" in col:
-            df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
-
-        # Telefones
-        if "telefone" in col:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.replace(r"\D", "", regex=True)
-                .str.pad(width=11, side="left", fillchar="0")
-            )
-
-        # E-mails
-        if "email" in col:
-            df[col] = df[col].str.lower().str.strip()
+    date_cols = [c for c in df.columns if "data" in c]
+    telefone_cols = [c for c in df.columns if "telefone" in c]
+    email_cols = [c for c in df.columns if "email" in c]
+
+    # Datas
+    if date_cols:
+        df[date_cols] = df[date_cols].apply(pd.to_datetime, errors="coerce", format="mixed")
+
+    # Telefones
+    if telefone_cols:
+        df[telefone_cols] = df[telefone_cols].apply(
+            lambda s: s.astype(str).str.replace(DIGITS_ONLY, "", regex=True).str.zfill(11)
+        )
+
+    # E-mails
+    if email_cols:
+        df[email_cols] = df[email_cols].apply(lambda s: s.str.lower().str.strip())
     return df
 
 # -------------------------------------------------
@@ -54,25 +79,26 @@ def remover_duplicatas(df, chave):
 # -------------------------------------------------
 def preencher_campos_vazios(df, tipo):
     """Preenche campos nulos segundo regras específicas"""
-    if tipo == "clientes":
-        df["estado"].fillna("SP", inplace=True)
-        df["cidade"].fillna("São Paulo", inplace=True)
-        df["nome"].fillna("Desconhecido", inplace=True)
-    elif tipo == "produtos":
-        df["categoria"].fillna("Outros", inplace=True)
-        df["ativo"].fillna(True, inplace=True)
-    elif tipo == "vendas":
-        df["status"].fillna("Pendente", inplace=True)
-    elif tipo == "logistica":
-        df["status_entrega"].fillna("Em trânsito", inplace=True)
-    return df
+    # Só colunas com nulos: evita criar categorias sem uso nas colunas category
+    padroes = {
+        col: valor
+        for col, valor in PADROES_PREENCHIMENTO.get(tipo, {}).items()
+        if col in df.columns and df[col].isna().any()
+    }
+    # Colunas category precisam ter o valor padrão entre as categorias
+    for col, valor in padroes.items():
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and valor not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([valor])
+    return df.fillna(padroes)
 
 # -------------------------------------------------
 def validar_relacionamentos(vendas, clientes, produtos):
     """Valida foreign keys entre vendas, clientes e produtos"""
+    cli_idx = pd.Index(clientes["id_cliente"].unique())
+    prod_idx = pd.Index(produtos["id_produto"].unique())
     vendas_validas = vendas[
-        vendas["id_cliente"].isin(clientes["id_cliente"]) &
-        vendas["id_produto"].isin(produtos["id_produto"])
+        vendas["id_cliente"].isin(cli_idx) &
+        vendas["id_produto"].isin(prod_idx)
     ]
     removidos = vendas.shape[0] - vendas_validas.shape[0]
     logging.info(f"Removidas {removidos} vendas com FK inválida.")
@@ -81,40 +107,46 @@ def validar_relacionamentos(vendas, clientes, produtos):
 # -------------------------------------------------
 def corrigir_inconsistencias(vendas, logistica):
     """Corrige inconsistências entre datasets"""
-    # Exemplo: datas de entrega antes do envio
-    mask = logistica["data_entrega_real"] < logistica["data_envio"]
-    logistica.loc[mask, "data_entrega_real"] = pd.NaT
+    # Exemplo: datas de entrega antes do envio (padronizar_dados já converteu
+    # as colunas para datetime); a correção é um único mask
+    entrega = logistica["data_entrega_real"]
+    mask = entrega < logistica["data_envio"]
+    logistica["data_entrega_real"] = entrega.mask(mask)
     logging.info(f"Corrigidas {mask.sum()} inconsistências de datas de entrega.")
     return vendas, logistica
 
 # -------------------------------------------------
-def processar_dataset(nome, chave=None):
-    """Pipeline completo de correção de um dataset"""
-    df = pd.read_csv(DATA_DIR / f"{nome}.csv", on_bad_lines="skip")
+def processar_dataset(nome, chave=None, colunas=None):
+    """
+    Pipeline completo de correção de um dataset. Grava o Parquet corrigido e
+    devolve só as colunas pedidas, para reduzir a serialização entre processos
+    """
+    configurar_logs()  # workers do loky são processos novos
+    df = pd.read_parquet(DATA_DIR / f"{nome}.parquet")
     df = padronizar_dados(df, nome)
     if chave:
         df = remover_duplicatas(df, chave)
     df = preencher_campos_vazios(df, nome)
-    df.to_csv(OUTPUT_DIR / f"{nome}_corrigido.csv", index=False)
+    df.to_parquet(OUTPUT_DIR / f"{nome}_corrigido.parquet", compression="snappy", index=False)
     logging.info(f"Dataset {nome} processado e salvo.")
-    return df
+    return df if colunas is None else df[colunas]
 
 # -------------------------------------------------
 def main():
     logging.info("Iniciando correção automática...")
     
-    clientes = processar_dataset("clientes", "id_cliente")
-    produtos = processar_dataset("produtos", "id_produto")
-    vendas = processar_dataset("vendas", "id_venda")
-    logistica = processar_dataset("logistica", "id_entrega")
-    clientes_lab = processar_dataset("clientes_lab", "id_cliente")
+    # Processos (loky): padronização e deduplicação seguram o GIL. Clientes e
+    # produtos voltam só com as chaves usadas na validação de relacionamentos
+    clientes, produtos, vendas, logistica, _ = Parallel(
+        n_jobs=len(DATASETS), backend="loky"
+    )(delayed(processar_dataset)(nome, chave, colunas) for nome, chave, colunas in DATASETS)
 
     # Relacionamentos e consistência
     vendas = validar_relacionamentos(vendas, clientes, produtos)
     vendas, logistica = corrigir_inconsistencias(vendas, logistica)
 
-    vendas.to_csv(OUTPUT_DIR / "vendas_corrigido.csv", index=False)
-    logistica.to_csv(OUTPUT_DIR / "logistica_corrigido.csv", index=False)
+    vendas.to_parquet(OUTPUT_DIR / "vendas_corrigido.parquet", compression="snappy", index=False)
+    logistica.to_parquet(OUTPUT_DIR / "logistica_corrigido.parquet", compression="snappy", index=False)
 
     logging.info("Correção concluída com sucesso.")
 
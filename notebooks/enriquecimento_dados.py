@@ -1,7 +1,7 @@
 # enriquecimento_dados.py
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from datetime import datetime
 
 DATA_DIR = Path("data")
 OUTPUT_DIR = Path("data/enriquecido")
@@ -18,41 +18,39 @@ def enriquecer_dados():
     print("🔍 Iniciando enriquecimento de dados...")
 
     # === 1. Carregar dados tratados ===
-    clientes = pd.read_csv(DATA_DIR / "clientes_tratado.csv")
-    produtos = pd.read_csv(DATA_DIR / "produtos_tratado.csv")
-    vendas = pd.read_csv(DATA_DIR / "vendas_tratado.csv")
-    logistica = pd.read_csv(DATA_DIR / "logistica_tratado.csv")
+    clientes = pd.read_parquet(DATA_DIR / "clientes_tratado.parquet")
+    produtos = pd.read_parquet(DATA_DIR / "produtos_tratado.parquet")
+    vendas = pd.read_parquet(DATA_DIR / "vendas_tratado.parquet")
+    logistica = pd.read_parquet(DATA_DIR / "logistica_tratado.parquet")
 
     # === 2. Geocodificação simulada ===
-    def simular_geocode(estado):
-        coordenadas = {
-            "SP": (-23.55, -46.63),
-            "RJ": (-22.90, -43.20),
-            "MG": (-19.92, -43.94),
-            "PR": (-25.42, -49.27)
-        }
-        return coordenadas.get(estado, (0.0, 0.0))
-
-    clientes[["latitude", "longitude"]] = clientes["estado"].apply(
-        lambda x: pd.Series(simular_geocode(x))
-    )
+    # Um único join com a tabela de referência; estados fora dela ficam em (0.0, 0.0)
+    geo_df = pd.DataFrame({
+        "estado": ["SP", "RJ", "MG", "PR"],
+        "latitude": [-23.55, -22.90, -19.92, -25.42],
+        "longitude": [-46.63, -43.20, -43.94, -49.27],
+    })
+    clientes = clientes.merge(geo_df, on="estado", how="left")
+    clientes[["latitude", "longitude"]] = clientes[["latitude", "longitude"]].fillna(0.0)
 
     # === 3. Categorização automática de produtos ===
-    def categorizar(produto):
-        p = produto.lower()
-        if "tv" in p or "smart" in p: return "Eletrônicos"
-        if "notebook" in p or "computador" in p: return "Informática"
-        if "camisa" in p or "calça" in p: return "Vestuário"
-        return "Outros"
-
-    produtos["categoria_automatica"] = produtos["nome_produto"].apply(categorizar)
+    # Primeira regra que casar vence, como na ordem dos ifs
+    nome = produtos["nome_produto"].str.lower()
+    regras = [
+        nome.str.contains(r"tv|smart", regex=True, na=False),
+        nome.str.contains(r"notebook|computador", regex=True, na=False),
+        nome.str.contains(r"camisa|cal[çc]a", regex=True, na=False),
+    ]
+    produtos["categoria_automatica"] = np.select(
+        regras, ["Eletrônicos", "Informática", "Vestuário"], default="Outros"
+    )
 
     # === 4. Cálculo de métricas derivadas ===
     # Idade do cliente
     clientes["data_nascimento"] = pd.to_datetime(clientes["data_nascimento"], errors="coerce")
-    clientes["idade"] = clientes["data_nascimento"].apply(
-        lambda x: int((datetime.now() - x).days / 365.25) if pd.notnull(x) else None
-    )
+    dias = (pd.Timestamp.now() - clientes["data_nascimento"]).dt.days
+    # trunc (não floor) como o int() original: nascimento no futuro dá 0, não -1
+    clientes["idade"] = np.trunc(dias / 365.25).astype("Int64")  # NaT vira <NA>
 
     # Tempo de entrega
     logistica["data_envio"] = pd.to_datetime(logistica["data_envio"], errors="coerce")
@@ -62,22 +60,18 @@ def enriquecer_dados():
     ).dt.days
 
     # === 5. Flags de qualidade ===
-    clientes["flag_qualidade"] = clientes.apply(
-        lambda row: "OK" if pd.notnull(row["email"]) and len(str(row["telefone"])) >= 10 else "VERIFICAR",
-        axis=1
-    )
-    produtos["flag_qualidade"] = produtos["preco"].apply(
-        lambda x: "OK" if x > 0 else "PREÇO_INVALIDO"
-    )
-    vendas["flag_qualidade"] = vendas.apply(
-        lambda r: "OK" if r["quantidade"] > 0 else "QUANTIDADE_INVALIDA", axis=1
+    clientes["flag_qualidade"] = np.where(
+        clientes["email"].notna() & (clientes["telefone"].astype(str).str.len() >= 10),
+        "OK", "VERIFICAR"
     )
+    produtos["flag_qualidade"] = np.where(produtos["preco"] > 0, "OK", "PREÇO_INVALIDO")
+    vendas["flag_qualidade"] = np.where(vendas["quantidade"] > 0, "OK", "QUANTIDADE_INVALIDA")
 
     # === 6. Salvar enriquecidos ===
-    clientes.to_csv(OUTPUT_DIR / "clientes_enriquecido.csv", index=False)
-    produtos.to_csv(OUTPUT_DIR / "produtos_enriquecido.csv", index=False)
-    vendas.to_csv(OUTPUT_DIR / "vendas_enriquecido.csv", index=False)
-    logistica.to_csv(OUTPUT_DIR / "logistica_enriquecido.csv", index=False)
+    clientes.to_parquet(OUTPUT_DIR / "clientes_enriquecido.parquet", compression="snappy", index=False)
+    produtos.to_parquet(OUTPUT_DIR / "produtos_enriquecido.parquet", compression="snappy", index=False)
+    vendas.to_parquet(OUTPUT_DIR / "vendas_enriquecido.parquet", compression="snappy", index=False)
+    logistica.to_parquet(OUTPUT_DIR / "logistica_enriquecido.parquet", compression="snappy", index=False)
 
     print("✅ Enriquecimento concluído com sucesso.")
     print(f"Arquivos gerados em: {OUTPUT_DIR.resolve()}")
@@ -19,9 +19,9 @@ def setup_great_expectations_context():
         context_root_dir="great_expectations"
     )
     
-    # Cria datasources baseados nos CSVs
-    for csv_file in DATA_DIR.glob("*.csv"):
-        datasource_name = csv_file.stem
+    # Cria datasources baseados nos Parquet
+    for parquet_file in DATA_DIR.glob("*.parquet"):
+        datasource_name = parquet_file.stem
         context.add_datasource(
             name=datasource_name,
             class_name="PandasDatasource",
@@ -67,8 +67,8 @@ def create_clientes_expectations(validator):
 if __name__ == "__main__":
     context = setup_great_expectations_context()
     
-    # Seleciona CSV de clientes como batch
-    batch_kwargs = {"path": str(DATA_DIR / "clientes.csv"), "datasource": "clientes"}
+    # Seleciona Parquet de clientes como batch
+    batch_kwargs = {"path": str(DATA_DIR / "clientes.parquet"), "datasource": "clientes"}
     validator = context.get_validator(batch_kwargs=batch_kwargs, expectation_suite_name="clientes_suite", create_expectation_suite=True)
     
     # Cria expectativas
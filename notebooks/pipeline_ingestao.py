@@ -1,13 +1,20 @@
 # pipeline_ingestao.py
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import re
+import unicodedata
 
 # -----------------------------
 # Configuração de diretórios
 DATASET_DIR = Path("datasets")  # arquivos originais
-OUTPUT_DIR = Path("data")       # arquivos processados
+OUTPUT_DIR = Path("data")       # arquivos processados (Parquet)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
 # -----------------------------
@@ -18,16 +25,81 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# -----------------------------
+# Leitura em blocos com o leitor CSV do PyArrow (multithread): o schema
+# declarado evita a inferência de tipos; as datas chegam como texto e são
+# convertidas nos clean_*
+BLOCK_SIZE = 8 << 20  # bytes por bloco
+
+SCHEMA = {
+    "clientes": {
+        "id_cliente": pa.int64(), "nome": pa.string(), "email": pa.string(), "telefone": pa.string(),
+        "data_nascimento": pa.string(), "cidade": pa.string(), "estado": pa.string(), "data_cadastro": pa.string(),
+    },
+    "clientes_lab": {
+        "id_cliente": pa.int64(), "nome": pa.string(), "email": pa.string(), "telefone": pa.string(),
+        "data_cadastro": pa.string(), "status": pa.string(), "idade": pa.float64(), "estado": pa.string(),
+    },
+    "produtos": {
+        "id_produto": pa.int64(), "nome_produto": pa.string(), "categoria": pa.string(), "preco": pa.float64(),
+        "estoque": pa.int64(), "data_criacao": pa.string(), "ativo": pa.bool_(),
+    },
+    "vendas": {
+        "id_venda": pa.int64(), "id_cliente": pa.int64(), "id_produto": pa.int64(), "quantidade": pa.int64(),
+        "valor_unitario": pa.float64(), "valor_total": pa.float64(), "data_venda": pa.string(), "status": pa.string(),
+    },
+    "logistica": {
+        "id_entrega": pa.int64(), "id_venda": pa.int64(), "transportadora": pa.string(), "data_envio": pa.string(),
+        "data_entrega_prevista": pa.string(), "data_entrega_real": pa.string(), "status_entrega": pa.string(),
+    },
+}
+
+class _TabelaAscii(dict):
+    """
+    Tabela para str.translate equivalente a NFKD + ASCII: cada code point
+    >= 0x80 é mapeado na primeira consulta e fica em cache; ASCII passa direto
+    """
+    def __missing__(self, c):
+        if c < 0x80:
+            raise LookupError(c)
+        self[c] = unicodedata.normalize('NFKD', chr(c)).encode('ascii', errors='ignore').decode('ascii') or None
+        return self[c]
+
+# Tabela de tradução única para remover acentos, aplicada com um único str.translate
+ACCENT_MAP = _TabelaAscii()
+
+# Regex compilada uma vez e reaproveitada em todos os blocos
+EMAIL_VALIDO = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+# Colunas de baixa cardinalidade convertidas para category após a limpeza;
+# o Parquet guarda a codificação em dicionário para as etapas seguintes
+CATEGORICAS = {
+    "clientes": ["estado"],
+    "clientes_lab": ["status", "estado"],
+    "produtos": ["categoria"],
+    "vendas": ["status"],
+    "logistica": ["status_entrega"],
+}
+
+# Chave primária de cada dataset (deduplicação entre blocos)
+CHAVES = {
+    "clientes": "id_cliente",
+    "clientes_lab": "id_cliente",
+    "produtos": "id_produto",
+    "vendas": "id_venda",
+    "logistica": "id_entrega",
+}
+
 def clean_clientes(df):
     # Corrige codificação
-    df['nome'] = df['nome'].astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
-    df['cidade'] = df['cidade'].astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+    df['nome'] = df['nome'].astype(str).str.translate(ACCENT_MAP)
+    df['cidade'] = df['cidade'].astype(str).str.translate(ACCENT_MAP)
 
     # Remove duplicatas
     df = df.drop_duplicates(subset='id_cliente', keep='first')
 
     # Valida e-mails
-    df = df[df['email'].notna() & df['email'].str.contains(r"[^@]+@[^@]+\.[^@]+")]
+    df = df[df['email'].notna() & df['email'].str.contains(EMAIL_VALIDO, na=False)]
 
     # Garante nome e telefone
     df = df[df['nome'].notna() & df['telefone'].notna()]
@@ -36,19 +108,17 @@ def clean_clientes(df):
     for col in ['data_nascimento', 'data_cadastro']:
         df[col] = pd.to_datetime(df[col], errors='coerce')
     df = df.dropna(subset=['data_nascimento', 'data_cadastro'])
-
-    logging.info(f"clientes.csv - registros finais: {df.shape[0]}")
     return df
 
 def clean_clientes_lab(df):
     # Corrige codificação
-    df['nome'] = df['nome'].astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+    df['nome'] = df['nome'].astype(str).str.translate(ACCENT_MAP)
 
     # Remove duplicatas
     df = df.drop_duplicates(subset='id_cliente', keep='first')
 
     # Valida e-mails
-    df = df[df['email'].notna() & df['email'].str.contains(r"[^@]+@[^@]+\.[^@]+")]
+    df = df[df['email'].notna() & df['email'].str.contains(EMAIL_VALIDO, na=False)]
 
     # Idade válida
     df = df[df['idade'].notna() & (df['idade'] >= 0) & (df['idade'] < 120)]
@@ -59,14 +129,12 @@ def clean_clientes_lab(df):
     # Datas
     df['data_cadastro'] = pd.to_datetime(df['data_cadastro'], errors='coerce')
     df = df.dropna(subset=['data_cadastro'])
-
-    logging.info(f"clientes_lab.csv - registros finais: {df.shape[0]}")
     return df
 
 def clean_produtos(df):
     # Corrige codificação
-    df['nome_produto'] = df['nome_produto'].astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
-    df['categoria'] = df['categoria'].astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+    df['nome_produto'] = df['nome_produto'].astype(str).str.translate(ACCENT_MAP)
+    df['categoria'] = df['categoria'].astype(str).str.translate(ACCENT_MAP)
 
     # Remove duplicatas
     df = df.drop_duplicates(subset='id_produto', keep='first')
@@ -81,8 +149,6 @@ def clean_produtos(df):
 
     # Ativo: bool
     df['ativo'] = df['ativo'].astype(bool)
-
-    logging.info(f"produtos.csv - registros finais: {df.shape[0]}")
     return df
 
 def clean_vendas(df, clientes_ids, produtos_ids):
@@ -101,8 +167,6 @@ def clean_vendas(df, clientes_ids, produtos_ids):
     # Datas
     df['data_venda'] = pd.to_datetime(df['data_venda'], errors='coerce')
     df = df.dropna(subset=['data_venda'])
-
-    logging.info(f"vendas.csv - registros finais: {df.shape[0]}")
     return df
 
 def clean_logistica(df, vendas_ids):
@@ -115,34 +179,93 @@ def clean_logistica(df, vendas_ids):
     # Datas
     for col in ['data_envio', 'data_entrega_prevista', 'data_entrega_real']:
         df[col] = pd.to_datetime(df[col], errors='coerce')
-
-    logging.info(f"logistica.csv - registros finais: {df.shape[0]}")
     return df
 
+def iter_clean(nome, cleaner, **kwargs):
+    """Lê o CSV bruto em blocos e devolve cada bloco já limpo"""
+    chave = CHAVES[nome]
+    vistos = set()
+    leitor = pacsv.open_csv(
+        DATASET_DIR / f"{nome}.csv",
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=BLOCK_SIZE, encoding='utf-8'),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=lambda row: 'skip'),
+        convert_options=pacsv.ConvertOptions(column_types=SCHEMA[nome], strings_can_be_null=True),
+    )
+    for batch in leitor:
+        chunk = batch.to_pandas()
+        # Nulos como NaN, como no pd.read_csv: o to_pandas do Arrow entrega None
+        # nas colunas object, e os clean_* dependem do NaN (astype(str) -> "nan",
+        # astype(bool) -> True)
+        texto = chunk.columns[chunk.dtypes == object]
+        chunk[texto] = chunk[texto].where(chunk[texto].notna(), np.nan)
+        # Duplicatas entre blocos: mantém a primeira ocorrência, como no arquivo
+        # inteiro. O set cresce no lugar, então cada bloco custa O(tamanho do bloco)
+        # (NaN vira None para que chaves nulas se repitam como no drop_duplicates)
+        chaves = [None if k != k else k for k in chunk[chave].tolist()]
+        chunk = chunk[np.fromiter((k not in vistos for k in chaves), dtype=bool, count=len(chaves))]
+        vistos.update(chaves)
+        chunk = cleaner(chunk, **kwargs)
+        # O astype(str) dos clean_* transforma nulos em "nan"; o CSV antigo
+        # voltava a ser NaN na leitura seguinte, o Parquet guardaria o texto
+        texto = chunk.columns[chunk.dtypes == object]
+        chunk[texto] = chunk[texto].mask(chunk[texto] == "nan")
+        for col in CATEGORICAS[nome]:
+            chunk[col] = chunk[col].astype('category')
+        yield chunk
+
+def schema_saida(nome):
+    """
+    Schema do Parquet de saída, derivado do SCHEMA de leitura: colunas data_*
+    viram timestamp (convertidas nos clean_*) e as CATEGORICAS viram dicionário.
+    Fixo para todos os blocos, inclusive os vazios ou só com nulos.
+    """
+    campos = []
+    for col, tipo in SCHEMA[nome].items():
+        if col.startswith("data_"):
+            tipo = pa.timestamp("ns")
+        elif col in CATEGORICAS[nome]:
+            tipo = pa.dictionary(pa.int32(), tipo)
+        campos.append(pa.field(col, tipo))
+    return pa.schema(campos)
+
+def ingerir(nome, cleaner, **kwargs):
+    """
+    Grava em /data os blocos limpos à medida que são lidos e devolve as chaves
+    gravadas como pd.Index (isin por hash em C nas validações de FK)
+    """
+    destino = OUTPUT_DIR / f"{nome}.parquet"
+    chaves = []
+    total = 0
+    schema = schema_saida(nome)
+    # O arquivo é sempre criado, mesmo sem nenhum bloco (Parquet vazio com schema)
+    with pq.ParquetWriter(destino, schema, compression='snappy') as writer:
+        for chunk in iter_clean(nome, cleaner, **kwargs):
+            tabela = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(tabela)
+            chaves.append(chunk[CHAVES[nome]].to_numpy())
+            total += chunk.shape[0]
+    logging.info(f"{nome}.parquet - registros finais: {total}")
+    return pd.Index(np.concatenate(chaves) if chaves else [])
+
 # -----------------------------
 # Pipeline de ingestão
 
 try:
-    # Carregamento
-    clientes = pd.read_csv(DATASET_DIR / "clientes.csv", encoding='utf-8', on_bad_lines='skip')
-    clientes_lab = pd.read_csv(DATASET_DIR / "clientes_lab.csv", encoding='utf-8', on_bad_lines='skip')
-    produtos = pd.read_csv(DATASET_DIR / "produtos.csv", encoding='utf-8', on_bad_lines='skip')
-    vendas = pd.read_csv(DATASET_DIR / "vendas.csv", encoding='utf-8', on_bad_lines='skip')
-    logistica = pd.read_csv(DATASET_DIR / "logistica.csv", encoding='utf-8', on_bad_lines='skip')
-
-    # Limpeza
-    clientes = clean_clientes(clientes)
-    clientes_lab = clean_clientes_lab(clientes_lab)
-    produtos = clean_produtos(produtos)
-    vendas = clean_vendas(vendas, clientes_ids=set(clientes['id_cliente']), produtos_ids=set(produtos['id_produto']))
-    logistica = clean_logistica(logistica, vendas_ids=set(vendas['id_venda']))
-
-    # Salva todos em /data
-    clientes.to_csv(OUTPUT_DIR / "clientes.csv", index=False)
-    clientes_lab.to_csv(OUTPUT_DIR / "clientes_lab.csv", index=False)
-    produtos.to_csv(OUTPUT_DIR / "produtos.csv", index=False)
-    vendas.to_csv(OUTPUT_DIR / "vendas.csv", index=False)
-    logistica.to_csv(OUTPUT_DIR / "logistica.csv", index=False)
+    # Carregamento, limpeza e gravação em /data (Parquet), bloco a bloco.
+    # Datasets sem dependência de FK rodam em paralelo; vendas e logística
+    # dependem das chaves gravadas nas etapas anteriores.
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        futs = {
+            "clientes": ex.submit(ingerir, "clientes", clean_clientes),
+            "clientes_lab": ex.submit(ingerir, "clientes_lab", clean_clientes_lab),
+            "produtos": ex.submit(ingerir, "produtos", clean_produtos),
+        }
+        clientes_ids = futs["clientes"].result()
+        futs["clientes_lab"].result()
+        produtos_ids = futs["produtos"].result()
+
+    vendas_ids = ingerir("vendas", clean_vendas, clientes_ids=clientes_ids, produtos_ids=produtos_ids)
+    ingerir("logistica", clean_logistica, vendas_ids=vendas_ids)
 
     logging.info("Pipeline de ingestão finalizado com sucesso.")
 